@@ -0,0 +1,36 @@
+"""
+Environment variables used by the app, read once per process.
+
+Streamlit re-executes streamlit_app.py on every rerun, but imported modules are
+only executed once, so values are read on first access and then kept on this
+module. Access them as attributes, e.g. ``envs.SNOWFLAKE_ACCOUNT``.
+"""
+import os
+from typing import Any, Callable, Dict
+
+_environment_variables: Dict[str, Callable[[], Any]] = {
+    # Enables debug logging and the st.secrets connection fallback
+    "DEBUG": lambda: os.environ.get("DEBUG", "false").lower() == "true",
+    # True when the Snowflake details are provided by the container environment
+    "RUNNING_IN_DOCKER": lambda: "SNOWFLAKE_ACCOUNT" in os.environ,
+    "SNOWFLAKE_ACCOUNT": lambda: os.environ.get("SNOWFLAKE_ACCOUNT", ""),
+    "SNOWFLAKE_USER": lambda: os.environ.get("SNOWFLAKE_USER", ""),
+    "SNOWFLAKE_PAT": lambda: os.environ.get("SNOWFLAKE_PAT", ""),
+    "SNOWFLAKE_WAREHOUSE": lambda: os.environ.get("SNOWFLAKE_WAREHOUSE", ""),
+    "SNOWFLAKE_DATABASE": lambda: os.environ.get("SNOWFLAKE_DATABASE", ""),
+    "SNOWFLAKE_SCHEMA": lambda: os.environ.get("SNOWFLAKE_SCHEMA", ""),
+    "SNOWFLAKE_AUTHENTICATOR": lambda: os.environ.get("SNOWFLAKE_AUTHENTICATOR", ""),
+}
+
+
+def __getattr__(name: str) -> Any:
+    """Read an environment variable on first access and cache it on the module."""
+    if name not in _environment_variables:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = _environment_variables[name]()
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return list(_environment_variables)
@@ -1,155 +1,174 @@
 # Standard library imports
-import json
+import hashlib
+import logging
 import os
-import time
 import tomllib
-from typing import Dict, List, Optional, Tuple
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 
 # Third-party imports
-import pandas as pd
-import requests
+import orjson
 import streamlit as st
-from PIL import Image
 
-# Snowflake related imports
-import snowflake.connector
-from snowflake.connector.errors import DatabaseError
-from snowflake.snowpark import Session
-from snowflake.snowpark.exceptions import SnowparkSQLException
+# Local imports
+import envs
 
-# Initialize session as None at the global scope
-session = None
+# Heavy dependencies (pandas, PIL, requests, snowflake) are imported inside the
+# functions that use them to keep cold start fast; these are for type hints only.
+if TYPE_CHECKING:
+    import pandas as pd
+    from PIL import Image
 
 # Check if we're in debug mode
 # In development, set DEBUG=true in environment variables
-DEBUG_MODE = os.environ.get("DEBUG", "false").lower() == "true"
+DEBUG_MODE = envs.DEBUG
+
+logger = logging.getLogger(__name__)
+if DEBUG_MODE and not logger.handlers:
+    # Streamlit re-executes this module on every rerun, so only attach the handler once
+    logger.addHandler(logging.StreamHandler())
+    logger.setLevel(logging.DEBUG)
+
+# Default values for the Snowflake connection parameters kept in session state
+_SF_DEFAULTS = {
+    "snowflake_account": "",
+    "snowflake_user": "",
+    "snowflake_authenticator": envs.SNOWFLAKE_AUTHENTICATOR or "snowflake",
+    "snowflake_token": "",
+    "snowflake_warehouse": "",
+    "snowflake_database": "",
+    "snowflake_schema": "",
+}
+
+# Sidebar input box keys and the session state keys they are mirrored into
+_INPUT_TO_STATE = {
+    "account_input": "snowflake_account",
+    "user_input": "snowflake_user",
+    "token_input": "snowflake_token",
+    "warehouse_input": "snowflake_warehouse",
+    "database_input": "snowflake_database",
+    "schema_input": "snowflake_schema",
+}
+
+
+def _mirror_inputs() -> bool:
+    """Copy any sidebar input box values into their session state keys.
+
+    Returns:
+        bool: True if at least one input box value was found.
+    """
+    mirrored = False
+    for input_key, state_key in _INPUT_TO_STATE.items():
+        if input_key in st.session_state:
+            st.session_state[state_key] = st.session_state[input_key]
+            mirrored = True
+    return mirrored
+
+
+# Session state keys and the [connections.snowflake] secrets that can seed them
+_STATE_TO_SECRET = {
+    "snowflake_account": "ACCOUNT",
+    "snowflake_user": "USER",
+    "snowflake_token": "PAT",
+    "snowflake_warehouse": "WAREHOUSE",
+    "snowflake_database": "DATABASE",
+    "snowflake_schema": "SCHEMA",
+}
+
+
+@st.cache_resource(show_spinner=False)
+def get_conn_params() -> Dict[str, str]:
+    """Return the [connections.snowflake] secrets as a plain dict, parsed once per process."""
+    # Checking for the file first keeps st.secrets from rendering its own error element
+    if not st.secrets.load_if_toml_exists():
+        logger.debug("No secrets.toml found")
+        return {}
+    if "connections" in st.secrets and "snowflake" in st.secrets["connections"]:
+        return dict(st.secrets["connections"]["snowflake"])
+    return {}
+
 
 # Initialize connection parameters in session state if they don't exist
 def init_connection_params():
+    # Environment variables and secrets only need to be read once per session;
+    # afterwards just keep session state in sync with the input boxes
+    if st.session_state.get("_conn_params_initialized"):
+        _mirror_inputs()
+        return
+
     # Initialize connection parameters with default values
-    if "snowflake_account" not in st.session_state:
-        st.session_state.snowflake_account = ""
-    if "snowflake_user" not in st.session_state:
-        st.session_state.snowflake_user = ""
-    if "snowflake_authenticator" not in st.session_state:
-        st.session_state.snowflake_authenticator = 'snowflake'
-    if "snowflake_token" not in st.session_state:
-        st.session_state.snowflake_token = ""
-    if "snowflake_warehouse" not in st.session_state:
-        st.session_state.snowflake_warehouse = ""
-    if "snowflake_database" not in st.session_state:
-        st.session_state.snowflake_database = ""
-    if "snowflake_schema" not in st.session_state:
-        st.session_state.snowflake_schema = ""
-    
-    # Check if input values exist in session state (these come from input boxes)
-    has_input_values = (
-        "account_input" in st.session_state or
-        "user_input" in st.session_state or
-        "token_input" in st.session_state or
-        "warehouse_input" in st.session_state or
-        "database_input" in st.session_state or
-        "schema_input" in st.session_state
-    )
+    for key, default in _SF_DEFAULTS.items():
+        st.session_state.setdefault(key, default)
     
     # If we have input values, they take precedence over everything else
-    if has_input_values:
-        print("\n==== Using Input Box Values ====")
-        if "account_input" in st.session_state:
-            st.session_state.snowflake_account = st.session_state.account_input
-            print(f"Using input box account: {st.session_state.account_input}")
-            
-        if "user_input" in st.session_state:
-            st.session_state.snowflake_user = st.session_state.user_input
-            print(f"Using input box user: {st.session_state.user_input}")
-            
-        if "token_input" in st.session_state:
-            st.session_state.snowflake_token = st.session_state.token_input
-            print(f"Using input box token (length: {len(st.session_state.token_input) if st.session_state.token_input else 0})")
-            
-        if "warehouse_input" in st.session_state:
-            st.session_state.snowflake_warehouse = st.session_state.warehouse_input
-            print(f"Using input box warehouse: {st.session_state.warehouse_input}")
-            
-        if "database_input" in st.session_state:
-            st.session_state.snowflake_database = st.session_state.database_input
-            print(f"Using input box database: {st.session_state.database_input}")
-            
-        if "schema_input" in st.session_state:
-            st.session_state.snowflake_schema = st.session_state.schema_input
-            print(f"Using input box schema: {st.session_state.schema_input}")
+    if _mirror_inputs():
+        logger.debug("==== Using Input Box Values ====")
+        st.session_state._conn_params_initialized = True
         return
     
     # Only use environment variables for initial values if no input box values exist
     # First priority: Environment variables (for container deployment)
-    env_account = os.environ.get("SNOWFLAKE_ACCOUNT", "")
-    env_user = os.environ.get("SNOWFLAKE_USER", "")
-    env_token = os.environ.get("SNOWFLAKE_PAT", "")
-    env_warehouse = os.environ.get("SNOWFLAKE_WAREHOUSE", "")
-    env_database = os.environ.get("SNOWFLAKE_DATABASE", "")
-    env_schema = os.environ.get("SNOWFLAKE_SCHEMA", "")
-    env_authenticator = os.environ.get("SNOWFLAKE_AUTHENTICATOR", "snowflake")
+    env_account = envs.SNOWFLAKE_ACCOUNT
+    env_user = envs.SNOWFLAKE_USER
+    env_token = envs.SNOWFLAKE_PAT
+    env_warehouse = envs.SNOWFLAKE_WAREHOUSE
+    env_database = envs.SNOWFLAKE_DATABASE
+    env_schema = envs.SNOWFLAKE_SCHEMA
     
     # Check if we're running in Docker
-    running_in_docker = "SNOWFLAKE_ACCOUNT" in os.environ
+    running_in_docker = envs.RUNNING_IN_DOCKER
     if running_in_docker:
-        print("\n==== Docker Environment Detected (Initial Values Only) ====")
-        print(f"Docker env account: {env_account}")
-        print(f"Docker env user: {env_user}")
-        print(f"Docker env token length: {len(env_token) if env_token else 0}")
+        if DEBUG_MODE:
+            logger.debug("==== Docker Environment Detected (Initial Values Only) ====")
+            logger.debug("Docker env account: %s", env_account)
+            logger.debug("Docker env user: %s", env_user)
+            logger.debug("Docker env token length: %s", len(env_token) if env_token else 0)
         
         # Only set initial values from environment if session state is empty
         if not st.session_state.snowflake_account and env_account and env_account != "your-account":
             st.session_state.snowflake_account = env_account
-            print(f"Setting initial account to: {env_account}")
+            logger.debug("Setting initial account to: %s", env_account)
             
         if not st.session_state.snowflake_user and env_user and env_user != "your-user":
             st.session_state.snowflake_user = env_user
-            print(f"Setting initial user to: {env_user}")
+            logger.debug("Setting initial user to: %s", env_user)
             
         if not st.session_state.snowflake_token and env_token and env_token != "your-token":
             st.session_state.snowflake_token = env_token
-            print(f"Setting initial token (length: {len(env_token)})")
+            logger.debug("Setting initial token")
             
         if not st.session_state.snowflake_warehouse and env_warehouse and env_warehouse != "your-warehouse":
             st.session_state.snowflake_warehouse = env_warehouse
-            print(f"Setting initial warehouse to: {env_warehouse}")
+            logger.debug("Setting initial warehouse to: %s", env_warehouse)
             
         if not st.session_state.snowflake_database and env_database and env_database != "your-database":
             st.session_state.snowflake_database = env_database
-            print(f"Setting initial database to: {env_database}")
+            logger.debug("Setting initial database to: %s", env_database)
             
         if not st.session_state.snowflake_schema and env_schema and env_schema != "your-schema":
             st.session_state.snowflake_schema = env_schema
-            print(f"Setting initial schema to: {env_schema}")
+            logger.debug("Setting initial schema to: %s", env_schema)
             
-        print("NOTE: These values will be overridden by input box values when provided.")
+        logger.debug("NOTE: These values will be overridden by input box values when provided.")
     
     # Print current session state values
-    print("\n==== Current Session State Values ====")
-    print(f"Session state account: {st.session_state.snowflake_account}")
-    print(f"Session state user: {st.session_state.snowflake_user}")
-    print(f"Session state token length: {len(st.session_state.snowflake_token) if st.session_state.snowflake_token else 0}")
-    print(f"Session state warehouse: {st.session_state.snowflake_warehouse}")
-    print(f"Session state database: {st.session_state.snowflake_database}")
-    print(f"Session state schema: {st.session_state.snowflake_schema}")
+    if DEBUG_MODE:
+        logger.debug("==== Current Session State Values ====")
+        logger.debug("Session state account: %s", st.session_state.snowflake_account)
+        logger.debug("Session state user: %s", st.session_state.snowflake_user)
+        logger.debug("Session state token length: %s", len(st.session_state.snowflake_token) if st.session_state.snowflake_token else 0)
+        logger.debug("Session state warehouse: %s", st.session_state.snowflake_warehouse)
+        logger.debug("Session state database: %s", st.session_state.snowflake_database)
+        logger.debug("Session state schema: %s", st.session_state.snowflake_schema)
         
     # Second priority: Streamlit secrets (for local development)
-    if DEBUG_MODE and "connections" in st.secrets and "snowflake" in st.secrets["connections"]:
+    if DEBUG_MODE:
         # Only use secrets if values aren't already set by environment variables
-        secrets = st.secrets["connections"]["snowflake"]
-        if not st.session_state.snowflake_account and "ACCOUNT" in secrets:
-            st.session_state.snowflake_account = secrets["ACCOUNT"]
-        if not st.session_state.snowflake_user and "USER" in secrets:
-            st.session_state.snowflake_user = secrets["USER"]
-        if not st.session_state.snowflake_token and "PAT" in secrets:
-            st.session_state.snowflake_token = secrets["PAT"]
-        if not st.session_state.snowflake_warehouse and "WAREHOUSE" in secrets:
-            st.session_state.snowflake_warehouse = secrets["WAREHOUSE"]
-        if not st.session_state.snowflake_database and "DATABASE" in secrets:
-            st.session_state.snowflake_database = secrets["DATABASE"]
-        if not st.session_state.snowflake_schema and "SCHEMA" in secrets:
-            st.session_state.snowflake_schema = secrets["SCHEMA"]
+        secrets = get_conn_params()
+        for state_key, secret_key in _STATE_TO_SECRET.items():
+            if not st.session_state[state_key] and secret_key in secrets:
+                st.session_state[state_key] = secrets[secret_key]
+
+    st.session_state._conn_params_initialized = True
 
 # List of available semantic model paths in the format: <DATABASE>.<SCHEMA>.<STAGE>/<FILE-NAME>
 # Each path points to a YAML file defining a semantic model
@@ -158,9 +177,85 @@ AVAILABLE_SEMANTIC_MODELS_PATHS = [
     "CORTEX_DEMOS.CONTOSO.ANALYST_STAGE/ContosoDemo.yaml",
     "CORTEX_ANALYST_DEMO.REVENUE_TIMESERIES.RAW_DATA/revenue_timeseries.yaml"
 ]
+# Display label (the file name) for each semantic model path, computed once
+_MODEL_LABELS = {p: p.rsplit("/", 1)[-1] for p in AVAILABLE_SEMANTIC_MODELS_PATHS}
 API_ENDPOINT = "/api/v2/cortex/analyst/message"
 FEEDBACK_API_ENDPOINT = "/api/v2/cortex/analyst/feedback"
 API_TIMEOUT = 50000  # in milliseconds
+API_TIMEOUT_SECONDS = API_TIMEOUT / 1000  # requests expects seconds
+MAX_DISPLAY_ROWS = 1000  # rows sent to the browser in the Data tab
+MAX_HISTORY_TURNS = 8  # earlier user/analyst exchanges sent along with each question
+MAX_RENDERED_BLOCKS = 16  # SQL blocks per user session redrawn without the st.cache_data copy
+README_CONFIG_PATH = "./config/config_readme.toml"
+# Cortex summary of a query result; the rows are bound as the prompt parameter
+INSIGHTS_SQL = "SELECT SNOWFLAKE.CORTEX.COMPLETE('mistral-large2', ?)"
+INSIGHTS_PROMPT = (
+    "Summarize results, Show trends & Itemize top insights & trends from the following "
+    "json data in less than 150 words. Data: "
+)
+
+# Page footer, emitted as a single markdown element
+_FOOTER_HTML = (
+    "---\n\n"
+    "Developed by [John Park, Qlik Analytics PreSales Architect](https://www.linkedin.com/in/jpark328/) | [Email](mailto:john.park@qlik.com) | [GitHub Repo](https://github.com/Parkman328/chatbot-demojrp/)\n\n"
+    "<hr style='margin-top:2em; margin-bottom:1em;'>"
+    "<div style='text-align:center; color:gray;'>"
+    "Developed for Demo Purpose Not Production Use."
+    "<br>"
+    "© 2025 Qlik, Inc. All rights reserved."
+    "</div>"
+)
+
+
+@st.cache_data(show_spinner=False)
+def _load_readme(path: str, mtime: float) -> Dict:
+    """Load the app readme/links config, parsed again only when the file's mtime changes."""
+    with open(path, "rb") as f:
+        return tomllib.load(f)
+
+
+@st.cache_resource(show_spinner=False)
+def _load_logo(path: str) -> Optional["Image.Image"]:
+    """Decode the sidebar logo once and reuse it across reruns and sessions."""
+    if not os.path.exists(path):
+        return None
+    from PIL import Image
+    return Image.open(path)
+
+
+@st.cache_resource(show_spinner=False)
+def _http_session():
+    """Shared HTTP session so Analyst API calls reuse pooled keep-alive connections."""
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    # The Analyst API only reads, so retrying a POST on a gateway error is safe. Read
+    # timeouts are not retried (read=False re-raises them, so requests reports a
+    # Timeout): the request may still be running and billed, and each retry would wait
+    # the full API_TIMEOUT again.
+    retries = Retry(
+        total=2,
+        connect=2,
+        read=False,
+        status=2,
+        backoff_factor=0.3,
+        status_forcelist=[502, 503, 504],
+        allowed_methods=frozenset({"POST"}),
+        raise_on_status=False,
+    )
+    http = requests.Session()
+    http.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retries))
+    http.headers.update({"Content-Type": "application/json"})
+    return http
+
+
+def _conn_token() -> Optional[str]:
+    """Return the session token of the active Snowflake connection, if any."""
+    try:
+        return st.session_state.CONN.rest.token
+    except (AttributeError, KeyError):
+        return None
 
 
 def main():
@@ -174,22 +269,14 @@ def main():
     init_connection_params()
     show_header_and_sidebar()
     # Check if we have an active Snowflake connection
-    has_connection = (
-        "CONN" in st.session_state
-        and st.session_state.CONN is not None
-        and hasattr(st.session_state.CONN, "rest")
-        and st.session_state.CONN.rest is not None
-        and hasattr(st.session_state.CONN.rest, "token")
-        and st.session_state.CONN.rest.token is not None
-    )
+    # Set when Connect succeeds and cleared when the Analyst API rejects the token
+    has_connection = st.session_state.get("_has_conn", False)
     
     # Only initiate the first question if we have a connection and no messages yet
     # and we didn't just reset the chat history
     just_reset = st.session_state.get('just_reset', False)
     
-    if len(st.session_state.messages) == 0 and has_connection and not just_reset:
-        process_user_input("What questions can I ask?")
-    elif len(st.session_state.messages) == 0 and not has_connection:
+    if len(st.session_state.messages) == 0 and not has_connection:
         # Clear the reset flag if it exists
         if just_reset:
             st.session_state.just_reset = False
@@ -205,37 +292,217 @@ def main():
         st.session_state.messages.append(welcome_message)
     
     display_conversation()
+    # New turns render in place below the history, so ask the opening question after it
+    if len(st.session_state.messages) == 0 and has_connection and not just_reset:
+        process_user_input("What questions can I ask?")
     handle_user_inputs()
-    handle_error_notifications()
 
 
 
 def reset_session_state():
-    """Reset important session state elements while preserving connection information."""
-    # Preserve Snowflake connection if it exists
-    snowflake_conn = st.session_state.get('CONN')
-    snowflake_session = st.session_state.get('session')
-    
+    """Reset the conversation; the Snowflake connection in CONN and session is left untouched."""
     # Reset conversation state
     st.session_state.messages = []  # List to store conversation messages
     st.session_state.active_suggestion = None  # Currently selected suggestion
+    st.session_state._render_cache = {}  # Rendered SQL blocks, keyed by message index and query
     
     # Add a flag to prevent automatic question
     st.session_state.just_reset = True
-    
-    # Restore Snowflake connection if it existed
-    if snowflake_conn is not None:
-        st.session_state.CONN = snowflake_conn
-    if snowflake_session is not None:
-        st.session_state.session = snowflake_session
+
+
+def _semantic_model_ref() -> str:
+    """Return the stage reference of the selected semantic model, e.g. "@DB.SCHEMA.STAGE/model.yaml"."""
+    ref = st.session_state.get("_semantic_model_ref")
+    if ref is None:
+        ref = st.session_state._semantic_model_ref = "@" + st.session_state.selected_semantic_model_path
+    return ref
+
+
+def _on_semantic_model_change():
+    """Store the newly selected semantic model reference and start a fresh conversation."""
+    st.session_state._semantic_model_ref = "@" + st.session_state.selected_semantic_model_path
+    reset_session_state()
+
+
+@st.fragment
+def _sidebar_connection():
+    """
+    Render the connection details and the Connect button as one form.
+
+    Edits are only submitted by the Connect button, so typing in the inputs
+    doesn't rerun anything, and a single click both saves and connects.
+    """
+    with st.form("snowflake_config", border=False):
+        st.title("1. Configuration")
+        with st.expander("Configurations", expanded=not DEBUG_MODE):
+            st.markdown("## Snowflake Connection Details")
+
+            # Allow editing of fields when not in debug mode
+            st.text_input("Account", value=st.session_state.snowflake_account, 
+                         disabled=DEBUG_MODE, key="account_input")
+            st.text_input("User", value=st.session_state.snowflake_user, 
+                         disabled=DEBUG_MODE, key="user_input")
+            st.text_input("Personal Access Token", value=st.session_state.snowflake_token, 
+                         type="password", disabled=DEBUG_MODE, key="token_input")
+            st.text_input("Warehouse", value=st.session_state.snowflake_warehouse, 
+                         disabled=DEBUG_MODE, key="warehouse_input")
+            st.text_input("Database", value=st.session_state.snowflake_database, 
+                         disabled=DEBUG_MODE, key="database_input")
+            st.text_input("Schema", value=st.session_state.snowflake_schema, 
+                         disabled=DEBUG_MODE, key="schema_input")
+
+        st.title("2. Connect to Snowflake")
+        with st.expander("Connect", expanded=False):
+            connect_button = st.form_submit_button("Connect to Snowflake")
+    notice = st.session_state.pop("_connect_notice", None)
+    if notice:
+        st.success(notice)
+    if connect_button:
+        # Ensure session state is updated with the latest input values
+        _mirror_inputs()
+
+        if not st.session_state.snowflake_token:
+            st.error("Please provide a valid Personal Access Token.")
+        elif not st.session_state.snowflake_account:
+            st.error("Please provide a valid Account.")
+        elif not st.session_state.snowflake_user:
+            st.error("Please provide a valid User.")
+        else:
+            if not _open_connection():
+                return
+            # Rerun the whole app so the chat picks up the new connection
+            st.session_state._connect_notice = f"Connection successful to {st.session_state.snowflake_account}!"
+            st.rerun()
+
+
+def get_snowflake_connection(
+    account: str, user: str, token: str, warehouse: str, database: str, schema: str, authenticator: str
+):
+    """
+    Log in to Snowflake with the given details.
+
+    This deliberately bypasses st.connection's process-wide cache. That cache is
+    keyed on the details alone and knows nothing about tokens the server has
+    expired, so every user with the same details would be handed the same stale
+    session token on each Connect. _open_connection keeps the returned connection
+    in session state instead, so each user session has its own login and reruns
+    don't log in again.
+
+    Args:
+        account (str): The Snowflake account identifier.
+        user (str): The Snowflake user.
+        token (str): The Personal Access Token, used as the password.
+        warehouse (str): The warehouse to use.
+        database (str): The database to use.
+        schema (str): The schema to use.
+        authenticator (str): The authenticator to log in with, see SNOWFLAKE_AUTHENTICATOR.
+
+    Returns:
+        SnowflakeConnection: The Streamlit wrapper of the connection.
+    """
+    from streamlit.connections import SnowflakeConnection
+
+    # The details come from the sidebar rather than secrets.toml, so use a connection
+    # name without a [connections.*] section and pass them as keyword arguments
+    return SnowflakeConnection(
+        "cortex_analyst",
+        account=account,
+        user=user,
+        authenticator=authenticator,
+        password=token,
+        warehouse=warehouse,
+        database=database,
+        schema=schema,
+    )
+
+
+def _connection_is_reusable(details: Tuple[str, ...]) -> bool:
+    """
+    Tell whether Connect can keep this user session's current connection.
+
+    is_closed() stays False after the server expires the session token, so a
+    connection is only kept while the Analyst API still accepts its token
+    (_has_conn, cleared on a 401) and the details are unchanged.
+    """
+    conn = st.session_state.get("CONN")
+    return (
+        conn is not None
+        and st.session_state.get("_has_conn", False)
+        and st.session_state.get("_conn_details") == details
+        and not conn.is_closed()
+    )
+
+
+def _open_connection() -> bool:
+    """
+    Attach a Snowflake connection and Snowpark session for the connection details to this user session.
+
+    Returns:
+        bool: True if the connection was opened successfully.
+    """
+    from snowflake.connector.errors import DatabaseError
+
+    details = (
+        st.session_state.snowflake_account,
+        st.session_state.snowflake_user,
+        st.session_state.snowflake_token,
+        st.session_state.snowflake_warehouse,
+        st.session_state.snowflake_database,
+        st.session_state.snowflake_schema,
+        st.session_state.snowflake_authenticator,
+    )
+    if not _connection_is_reusable(details):
+        previous = st.session_state.get("CONN")
+        if previous is not None:
+            # Only this user session uses it; end its server session before logging in again
+            try:
+                previous.close()
+            except Exception as e:
+                logger.debug("Failed to close the previous connection: %s", e)
+        try:
+            connection = get_snowflake_connection(*details)
+            conn = connection.raw_connection
+            # Snowpark runs on the same connection instead of authenticating a second time
+            snowpark_session = connection.session()
+        except DatabaseError as e:
+            st.session_state.CONN = None
+            st.session_state.session = None
+            st.session_state._has_conn = False
+            st.session_state._session_key = None
+            st.session_state._conn_details = None
+            # Don't keep sending requests to the previously connected account's URL with
+            # the header built for its token
+            st.session_state.pop("_analyst_url", None)
+            st.session_state.pop("_auth_header", None)
+            st.error(f"Failed to connect: {e}")
+            return False
+        st.session_state.CONN = conn
+        st.session_state.session = snowpark_session
+        st.session_state._conn_details = details
+    st.session_state._has_conn = _conn_token() is not None
+    st.session_state._analyst_url = (
+        f"https://{st.session_state.snowflake_account}.snowflakecomputing.com{API_ENDPOINT}"
+    )
+    # Separates cached query results of different accounts, users and contexts
+    session_key = ":".join((
+        st.session_state.snowflake_account,
+        st.session_state.snowflake_user,
+        st.session_state.snowflake_warehouse,
+        st.session_state.snowflake_database,
+        st.session_state.snowflake_schema,
+    ))
+    if session_key != st.session_state.get("_session_key"):
+        # Results drawn for the previous connection must not be redrawn for this one
+        st.session_state._render_cache = {}
+    st.session_state._session_key = session_key
+    return True
 
 
 def show_header_and_sidebar():
     """Display the header and sidebar of the app."""
     # Page config
     st.set_page_config(page_title="Snowflake Cortext Analyst", layout="wide")
-    with open("./config/config_readme.toml", "rb") as f:
-        readme = tomllib.load(f)
+    readme = _load_readme(README_CONFIG_PATH, os.path.getmtime(README_CONFIG_PATH))
     # Show title and description.
     st.markdown(
         "<span style='font-size:2em; font-weight:bold;'>Snowflake Cortext Analyst for Qlik Cloud</span>",
@@ -251,8 +518,9 @@ def show_header_and_sidebar():
         st.write("")
     # Display logo at the top of the sidebar
     logo_path = "./references/qlik_snowflake_cortext.png"
-    if os.path.exists(logo_path):
-        st.sidebar.image(Image.open(logo_path), use_container_width=True)
+    logo = _load_logo(logo_path)
+    if logo is not None:
+        st.sidebar.image(logo, use_container_width=True)
     else:
         st.sidebar.write(":warning: Logo not found.")
 
@@ -264,120 +532,16 @@ def show_header_and_sidebar():
         with col2:
             st.markdown(f"[Article]({readme['links']['article']})")
         st.divider()
-        st.sidebar.title("1. Configuration")
-        with st.sidebar.expander("Configurations", expanded=not DEBUG_MODE):
-            st.markdown("## Snowflake Connection Details")
-            
-            # Define callback functions to handle input changes
-            def update_account():
-                st.session_state.snowflake_account = st.session_state.account_input
-                print(f"Updated account: {st.session_state.snowflake_account}")
-            def update_user():
-                st.session_state.snowflake_user = st.session_state.user_input
-                print(f"Updated user: {st.session_state.snowflake_user}")
-            def update_token():
-                st.session_state.snowflake_token = st.session_state.token_input
-                print(f"Updated token: {st.session_state.snowflake_token}")
-            def update_warehouse():
-                st.session_state.snowflake_warehouse = st.session_state.warehouse_input
-                print(f"Updated warehouse: {st.session_state.snowflake_warehouse}")
-            def update_database():
-                st.session_state.snowflake_database = st.session_state.database_input
-                print(f"Updated database: {st.session_state.snowflake_database}")
-            def update_schema():
-                st.session_state.snowflake_schema = st.session_state.schema_input
-                print(f"Updated schema: {st.session_state.snowflake_schema}")
-            
-            # Allow editing of fields when not in debug mode
-            st.text_input("Account", value=st.session_state.snowflake_account, 
-                         disabled=DEBUG_MODE, key="account_input", on_change=update_account)
-            st.text_input("User", value=st.session_state.snowflake_user, 
-                         disabled=DEBUG_MODE, key="user_input", on_change=update_user)
-            st.text_input("Personal Access Token", value=st.session_state.snowflake_token, 
-                         type="password", disabled=DEBUG_MODE, key="token_input", on_change=update_token)
-            st.text_input("Warehouse", value=st.session_state.snowflake_warehouse, 
-                         disabled=DEBUG_MODE, key="warehouse_input", on_change=update_warehouse)
-            st.text_input("Database", value=st.session_state.snowflake_database, 
-                         disabled=DEBUG_MODE, key="database_input", on_change=update_database)
-            st.text_input("Schema", value=st.session_state.snowflake_schema, 
-                         disabled=DEBUG_MODE, key="schema_input", on_change=update_schema)
-            
-        st.sidebar.title("2. Connect to Snowflake")
-        with st.sidebar.expander("Connect", expanded=False):
-            connect_button = st.button("Connect to Snowflake")
-        if connect_button:
-            # Ensure session state is updated with the latest input values
-            if "account_input" in st.session_state:
-                st.session_state.snowflake_account = st.session_state.account_input
-            if "user_input" in st.session_state:
-                st.session_state.snowflake_user = st.session_state.user_input
-            if "token_input" in st.session_state:
-                st.session_state.snowflake_token = st.session_state.token_input
-            if "warehouse_input" in st.session_state:
-                st.session_state.snowflake_warehouse = st.session_state.warehouse_input
-            if "database_input" in st.session_state:
-                st.session_state.snowflake_database = st.session_state.database_input
-            if "schema_input" in st.session_state:
-                st.session_state.snowflake_schema = st.session_state.schema_input
-                
-            #print(f"Account: {st.session_state.snowflake_account}")
-            #print(f"User: {st.session_state.snowflake_user}")
-            #print(f"Token: {st.session_state.snowflake_token}")
-            #print(f"Warehouse: {st.session_state.snowflake_warehouse}")
-            #print(f"Database: {st.session_state.snowflake_database}")
-            #print(f"Schema: {st.session_state.snowflake_schema}")
-            
-            if not st.session_state.snowflake_token:
-                st.error("Please provide a valid Personal Access Token.")
-            elif not st.session_state.snowflake_account:
-                st.error("Please provide a valid Account.")
-            elif not st.session_state.snowflake_user:
-                st.error("Please provide a valid User.")
-            else:
-                try:
-                    conn = snowflake.connector.connect(
-                        account=st.session_state.snowflake_account,
-                        user=st.session_state.snowflake_user,
-                        authenticator='snowflake',
-                        password=st.session_state.snowflake_token,
-                        warehouse=st.session_state.snowflake_warehouse,
-                        database=st.session_state.snowflake_database,
-                        schema=st.session_state.snowflake_schema
-                    )
-                    st.session_state.CONN = conn
-                    st.success(f"Connection successful to {st.session_state.snowflake_account}!")
-                    connection_parameters = {
-                        "account": st.session_state.snowflake_account,
-                        "user": st.session_state.snowflake_user,
-                        "authenticator": 'snowflake',
-                        "password": st.session_state.snowflake_token,
-                        "warehouse": st.session_state.snowflake_warehouse,
-                        "database": st.session_state.snowflake_database,
-                        "schema": st.session_state.snowflake_schema,
-                    }
-                    # Initialize the global session variable
-                    global session
-                    session = Session.builder.configs(connection_parameters).create()
-                    st.session_state.session = session  # Also store in session state for persistence
-                    #cur = conn.cursor()
-                    #cur.execute("SELECT CURRENT_VERSION(), CURRENT_WAREHOUSE(), CURRENT_DATABASE(), CURRENT_SCHEMA()")
-                    #result = cur.fetchall()
-                    #st.write("Connection Info:")
-                    #for row in result:
-                        #st.write(row)
-                    #cur.close()
-                except DatabaseError as e:
-                    st.error(f"Failed to connect: {e}")
-                    _, btn_container, _ = st.columns([2, 6, 2])
+        _sidebar_connection()
         st.sidebar.title("3. Semantic Model")
         with st.sidebar.expander("Select Semantic Model", expanded=False):
             #st.markdown("Select the semantic model to use for the Analyst API.")
             #st.markdown("You can upload your own semantic model YAML files to the specified stage in Snowflake and add the path here.")
             #st.markdown("Make sure the semantic model is compatible with the Analyst API.")
             st.selectbox("Select Model", AVAILABLE_SEMANTIC_MODELS_PATHS,
-                format_func=lambda s: s.split("/")[-1],
+                format_func=_MODEL_LABELS.get,
                 key="selected_semantic_model_path",
-                on_change=reset_session_state,
+                on_change=_on_semantic_model_change,
                 label_visibility="collapsed"
             )
         st.sidebar.title("4. Clean Up Session")
@@ -393,7 +557,7 @@ def handle_user_inputs():
     """
     # Handle chat input
     user_input = st.chat_input("What is your question?")
-    print(f"User input: {user_input}")
+    logger.debug("User input: %s", user_input)
     if user_input:
         process_user_input(user_input)
     # Handle suggested question click
@@ -402,11 +566,9 @@ def handle_user_inputs():
         st.session_state.active_suggestion = None
         process_user_input(suggestion)
 
-def handle_error_notifications():
-    """Display error notifications using toast messages."""
-    if st.session_state.get("fire_API_error_notify"):
-        st.toast("An API error has occurred!", icon="🚨")
-        st.session_state["fire_API_error_notify"] = False
+def _notify_api_error():
+    """Flag a failed Analyst API call with a toast."""
+    st.toast("An API error has occurred!", icon="🚨")
 
 def process_user_input(prompt: str):
     """
@@ -416,28 +578,33 @@ def process_user_input(prompt: str):
         prompt (str): The user's input.
     """
 
-    # Create a new message, append to history and display imidiately
+    # Create a new message and display it immediately; it is only added to the
+    # history together with the analyst's reply
     new_user_message = {
         "role": "user",
         "content": [{"type": "text", "text": prompt}],
     }
-    print(f"New user message: {new_user_message}")
-    st.session_state.messages.append(new_user_message)
+    logger.debug("New user message: %s", new_user_message)
     with st.chat_message("user"):
-        user_msg_index = len(st.session_state.messages) - 1
-        display_message(new_user_message["content"], user_msg_index)
+        display_message(new_user_message["content"], len(st.session_state.messages))
 
     # Show progress indicator inside analyst chat message while waiting for response
-    with st.chat_message("analyst"):
+    with st.chat_message("analyst", avatar="❄️"):
         with st.spinner("Waiting for Analyst's response..."):
-            time.sleep(1)
             try:
-                response, error_msg = get_analyst_response(st.session_state.messages)
+                response, error_msg = get_analyst_response(
+                    _trim_history(st.session_state.messages + [new_user_message])
+                )
                 
-                if error_msg is None and response and "message" in response and "content" in response["message"]:
+                if (
+                    error_msg is None
+                    and response
+                    and isinstance(response.get("message"), dict)
+                    and "content" in response["message"]
+                ):
                     analyst_message = {
                         "role": "analyst",
-                        "content": response["message"]["content"],
+                        "content": _validate_and_normalize(response["message"]["content"]),
                         "request_id": response.get("request_id", "unknown"),
                     }
                 else:
@@ -450,10 +617,7 @@ def process_user_input(prompt: str):
                         "content": [{"type": "text", "text": error_text}],
                         "request_id": request_id,
                     }
-                    st.session_state["fire_API_error_notify"] = True
-                    
-                st.session_state.messages.append(analyst_message)
-                st.rerun()
+                    _notify_api_error()
             except Exception as e:
                 # Handle unexpected exceptions
                 error_text = f"An unexpected error occurred: {str(e)}"
@@ -462,9 +626,148 @@ def process_user_input(prompt: str):
                     "content": [{"type": "text", "text": error_text}],
                     "request_id": "error",
                 }
-                st.session_state["fire_API_error_notify"] = True
-                st.session_state.messages.append(analyst_message)
-                st.rerun()
+                _notify_api_error()
+
+        # Render the reply where it will sit in the history instead of rerunning the
+        # whole app, which would re-render every earlier message
+        display_message(analyst_message["content"], len(st.session_state.messages) + 1)
+
+    st.session_state.messages.extend((new_user_message, analyst_message))
+
+
+def _trim_history(messages: List[Dict], turns: int = MAX_HISTORY_TURNS) -> List[Dict]:
+    """
+    Reduce the conversation to what the Analyst API needs for the next answer.
+
+    Keeps the last `turns` exchanges plus the new question, starting at a user
+    message, with only the role and the text and SQL items of each message.
+
+    Args:
+        messages (List[Dict]): The conversation, ending with the new user message.
+        turns (int): How many earlier user/analyst exchanges to keep.
+
+    Returns:
+        List[Dict]: The messages to send.
+    """
+    window = messages[-(2 * turns + 1):]
+    # The API expects the conversation to open with a user message, e.g. not the welcome text
+    while window and window[0]["role"] != "user":
+        window = window[1:]
+    return [
+        {
+            "role": message["role"],
+            # Suggestions only matter to the UI; keep them if nothing else is left
+            "content": [item for item in message["content"] if item["type"] in ("text", "sql")]
+            or message["content"],
+        }
+        for message in window
+    ]
+
+
+class _AnalystAPIError(Exception):
+    """Raised by _cached_analyst_call for failed or malformed responses so they are not cached."""
+
+    def __init__(self, resp, request_id: str, body: Optional[Dict]):
+        super().__init__(f"Analyst API request {request_id} failed with status {resp.status_code}")
+        self.resp = resp
+        self.request_id = request_id
+        self.body = body
+
+
+@st.cache_data(ttl=600, show_spinner=False)
+def _cached_analyst_call(api_url: str, user: str, payload: bytes, _headers: Dict) -> Tuple[Dict, str]:
+    """
+    POST a serialized conversation to the Cortex Analyst API.
+
+    The url, user and payload form the cache key, so identical conversations
+    (e.g. the "What questions can I ask?" bootstrap) skip the round trip. The
+    headers carry the per-connection token and are excluded from hashing.
+
+    Args:
+        api_url (str): The Analyst API endpoint of the account.
+        user (str): The Snowflake user, so cached answers are not shared across users.
+        payload (bytes): The JSON encoded request body.
+        _headers (Dict): The request headers, including the Authorization token.
+
+    Returns:
+        Tuple[Dict, str]: The parsed response body and the Snowflake request id.
+
+    Raises:
+        _AnalystAPIError: If the request failed or the response is malformed.
+    """
+    resp = _http_session().post(
+        url=api_url,
+        data=payload,
+        headers=_headers,
+        timeout=API_TIMEOUT_SECONDS,
+    )
+    
+    logger.debug("==== Response received ====")
+    logger.debug("Status code: %s", resp.status_code)
+    request_id = resp.headers.get("X-Snowflake-Request-Id", "unknown")
+    logger.debug("Request ID: %s", request_id)
+    logger.debug("Response headers: %s", resp.headers)
+    
+    # Parse the body once; it is needed on both the success and error paths
+    try:
+        body = orjson.loads(resp.content) if resp.content else {}
+    except orjson.JSONDecodeError as json_err:
+        logger.debug("Failed to parse response as JSON: %s", json_err)
+        logger.debug("Raw response content: %s", resp.content)
+        body = None
+    logger.debug("Response JSON: %s", body)
+    
+    # Validate response structure
+    if (
+        resp.status_code < 400
+        and isinstance(body, dict)
+        and isinstance(body.get("message"), dict)
+        and "content" in body["message"]
+    ):
+        logger.debug("Valid response structure found")
+        return body, request_id
+    raise _AnalystAPIError(resp, request_id, body)
+
+
+def _format_api_error(resp, request_id: str, body: Optional[Dict]) -> str:
+    """
+    Build a readable error message for a failed Analyst API request.
+
+    Args:
+        resp: The HTTP response returned by the Analyst API.
+        request_id (str): The Snowflake request id of the failed request.
+        body (Optional[Dict]): The parsed JSON body, or None if it could not be parsed.
+
+    Returns:
+        str: A markdown formatted error message.
+    """
+    if not isinstance(body, dict):
+        return f"Failed request (id: {request_id}) with status {resp.status_code}: {resp.content}"
+    return (
+        "🚨 An Analyst API error has occurred 🚨\n\n"
+        f"* response code: `{resp.status_code}`\n"
+        f"* request-id: `{request_id}`\n"
+        f"* error code: `{body.get('error_code', 'N/A')}`\n\n"
+        "Message:\n"
+        f"```\n{body.get('message', 'No message provided')}\n```"
+    )
+
+
+def _analyst_url() -> str:
+    """Return the Analyst API URL of the connected account, see _open_connection."""
+    url = st.session_state.get("_analyst_url")
+    if url is None:
+        url = f"https://{st.session_state.snowflake_account}.snowflakecomputing.com{API_ENDPOINT}"
+    return url
+
+
+def _auth_header(token: str) -> Dict[str, str]:
+    """Return the Authorization header for a token, rebuilt only when the token changes."""
+    cached = st.session_state.get("_auth_header")
+    if cached is None or cached[0] != token:
+        cached = st.session_state._auth_header = (token, {"Authorization": f'Snowflake Token="{token}"'})
+    return cached[1]
+
 
 def get_analyst_response(messages: List[Dict]) -> Tuple[Dict, Optional[str]]:
     """
@@ -476,143 +779,74 @@ def get_analyst_response(messages: List[Dict]) -> Tuple[Dict, Optional[str]]:
     Returns:
         Tuple[Dict, Optional[str]]: The response from the Cortex Analyst API and any error message.
     """
-    print("Inside get analyst response")
+    import requests
+
+    logger.debug("Inside get analyst response")
     
-    # Get values from input boxes or session state
-    account = st.session_state.account_input if "account_input" in st.session_state else st.session_state.snowflake_account
-    user = st.session_state.user_input if "user_input" in st.session_state else st.session_state.snowflake_user
-    token = st.session_state.token_input if "token_input" in st.session_state else st.session_state.snowflake_token
-    warehouse = st.session_state.warehouse_input if "warehouse_input" in st.session_state else st.session_state.snowflake_warehouse
-    database = st.session_state.database_input if "database_input" in st.session_state else st.session_state.snowflake_database
-    schema = st.session_state.schema_input if "schema_input" in st.session_state else st.session_state.snowflake_schema
+    # The submitted connection details are mirrored into session state on every rerun
+    user = st.session_state.snowflake_user
+    token = st.session_state.snowflake_token
+    schema = st.session_state.snowflake_schema
     
     # For minimal debugging
-    print(f"Schema: {schema}")
-    
-    # Set up API endpoint
-    HOST = account + ".snowflakecomputing.com"
-    api_url = f"https://{HOST}{API_ENDPOINT}"
+    logger.debug("Schema: %s", schema)
     
     # Prepare the request body
     request_body = {
         "messages": messages,
-        "semantic_model_file": f"@{st.session_state.selected_semantic_model_path}",
+        "semantic_model_file": _semantic_model_ref(),
     }
     
     # Debug session state
-    print("\n==== Session state debug ====")
-    print(f"CONN in session state: {'CONN' in st.session_state}")
-    if 'CONN' in st.session_state:
-        print(f"CONN is None: {st.session_state.CONN is None}")
-        if st.session_state.CONN is not None:
-            print(f"Has rest attribute: {hasattr(st.session_state.CONN, 'rest')}")
-            if hasattr(st.session_state.CONN, 'rest'):
-                print(f"rest is None: {st.session_state.CONN.rest is None}")
-                if st.session_state.CONN.rest is not None:
-                    print(f"Has token attribute: {hasattr(st.session_state.CONN.rest, 'token')}")
-                    if hasattr(st.session_state.CONN.rest, 'token'):
-                        print(f"Token is None: {st.session_state.CONN.rest.token is None}")
-                        print(f"Token length: {len(st.session_state.CONN.rest.token) if st.session_state.CONN.rest.token else 0}")
-    print("==== End session state debug ====")
+    if DEBUG_MODE and logger.isEnabledFor(logging.DEBUG):
+        logger.debug("==== Session state debug ====")
+        conn_token = _conn_token()
+        logger.debug("CONN token available: %s", conn_token is not None)
+        logger.debug("CONN token length: %s", len(conn_token) if conn_token else 0)
+        logger.debug("==== End session state debug ====")
 
     try:
-        print("\n==== Making API request ====")
-        
-        # Determine which token to use for the API request
-        token_to_use = None
+        logger.debug("==== Making API request ====")
         
-        # First try to get from session state CONN object
-        if ("CONN" in st.session_state and 
-            st.session_state.CONN is not None and 
-            hasattr(st.session_state.CONN, "rest") and 
-            st.session_state.CONN.rest is not None and 
-            hasattr(st.session_state.CONN.rest, "token") and 
-            st.session_state.CONN.rest.token is not None):
-            token_to_use = st.session_state.CONN.rest.token
-            print("Using token from session state (CONN)")
+        # Prefer the session token of the active connection, falling back to
+        # the personal access token from the connection details
+        token_to_use = _conn_token() or token
         
-        # If not in CONN, use the token we got earlier
-        if token_to_use is None:
-            token_to_use = token
-            print("Using token from function parameters")
-        
-        # Prepare headers with token
-        headers = {
-            "Authorization": f'Snowflake Token="{token_to_use}"',
-            "Content-Type": "application/json",
-        }
-        
-        # Send a POST request to the Cortex Analyst API endpoint
-        resp = requests.post(
-            url=api_url,
-            json=request_body,
-            headers=headers,
-            timeout=API_TIMEOUT/1000,  # Convert milliseconds to seconds
+        # Repeated conversations are answered from the cache; Content-Type is set
+        # on the shared HTTP session
+        body, request_id = _cached_analyst_call(
+            _analyst_url(), user, orjson.dumps(request_body), _auth_header(token_to_use)
         )
-        
-        print(f"\n==== Response received ====")
-        print(f"Status code: {resp.status_code}")
-        request_id = resp.headers.get("X-Snowflake-Request-Id", "unknown")
-        print(f"Request ID: {request_id}")
-        print(f"Response headers: {resp.headers}")
-        
-        if resp.status_code < 400:
-            print("Success response (status < 400)")
-            response_json = resp.json()
-            print(f"Response JSON: {response_json}")
-            
-            # Validate response structure
-            if "message" in response_json and "content" in response_json["message"]:
-                print("Valid response structure found")
-                return {**response_json, "request_id": request_id}, None
-            else:
-                print("Invalid response structure")
-                error_msg = "Received an invalid response format from the Analyst API."
-                return {"request_id": request_id}, error_msg
+        return {**body, "request_id": request_id}, None
+    except _AnalystAPIError as e:
+        if e.resp.status_code < 400:
+            logger.debug("Invalid response structure")
+            error_msg = "Received an invalid response format from the Analyst API."
         else:
-            print(f"Error response: {resp.status_code}")
-            # Craft readable error message for HTTP errors
-            try:
-                parsed_content = resp.json()
-                print(f"Error content: {parsed_content}")
-                error_msg = f"""
-                🚨 An Analyst API error has occurred 🚨
-
-                * response code: `{resp.status_code}`
-                * request-id: `{request_id}`
-                * error code: `{parsed_content.get('error_code', 'N/A')}`
-
-                Message:
-                ```
-                {parsed_content.get('message', 'No message provided')}
-                ```
-                """
-            except Exception as json_err:
-                print(f"Failed to parse error response as JSON: {json_err}")
-                print(f"Raw response content: {resp.content}")
-                error_msg = f"Failed request (id: {request_id}) with status {resp.status_code}: {resp.content}"
-            
-            return {"request_id": request_id}, error_msg
-            
+            logger.debug("Error response: %s", e.resp.status_code)
+            error_msg = _format_api_error(e.resp, e.request_id, e.body)
+            if e.resp.status_code == 401:
+                # The session token is no longer accepted; treat the connection as gone
+                st.session_state._has_conn = False
+        return {"request_id": e.request_id}, error_msg
     except requests.exceptions.Timeout:
-        print(f"\n==== Timeout Exception ====")
-        print(f"Request timed out after {API_TIMEOUT/1000} seconds")
-        error_msg = f"Request timed out after {API_TIMEOUT/1000} seconds. Please try again."
+        logger.debug("==== Timeout Exception ====")
+        logger.debug("Request timed out after %s seconds", API_TIMEOUT_SECONDS)
+        error_msg = f"Request timed out after {API_TIMEOUT_SECONDS} seconds. Please try again."
         return {"request_id": "timeout"}, error_msg
     except requests.exceptions.RequestException as e:
-        print(f"\n==== Request Exception ====")
-        print(f"Type: {type(e).__name__}")
-        print(f"Message: {str(e)}")
-        print(f"Details: {repr(e)}")
+        logger.debug("==== Request Exception ====")
+        logger.debug("Type: %s", type(e).__name__)
+        logger.debug("Message: %s", e)
+        logger.debug("Details: %r", e)
         error_msg = f"Request error: {str(e)}"
         return {"request_id": "error"}, error_msg
     except Exception as e:
-        print(f"\n==== Unexpected Exception ====")
-        print(f"Type: {type(e).__name__}")
-        print(f"Message: {str(e)}")
-        print(f"Details: {repr(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.debug("==== Unexpected Exception ====")
+        logger.debug("Type: %s", type(e).__name__)
+        logger.debug("Message: %s", e)
+        logger.debug("Details: %r", e)
+        logger.exception("Unexpected error while calling the Analyst API")
         error_msg = f"Unexpected error: {str(e)}"
         return {"request_id": "error"}, error_msg
 
@@ -621,74 +855,210 @@ def display_conversation():
     Display the conversation history between the user and the assistant.
     """
     for idx, message in enumerate(st.session_state.messages):
-        role = message["role"]
-        content = message["content"]
-        
-        # Use snowflake emoji as avatar for analyst role
-        if role == "analyst":
-            with st.chat_message(role, avatar="❄️"):
-                display_message(content, idx)
-        else:
-            with st.chat_message(role):
-                display_message(content, idx)
+        _render_message(message["role"], message["content"], idx)
+
+
+@st.fragment
+def _render_message(role: str, content: List[Dict], idx: int):
+    """
+    Render one chat message.
+
+    Runs as a fragment, so interacting with a widget inside one message doesn't
+    re-render every other message in the history.
+
+    Args:
+        role (str): The message role, "user" or "analyst".
+        content (List[Dict]): The message content.
+        idx (int): The index of the message for unique component keys.
+    """
+    # Use snowflake emoji as avatar for analyst role
+    if role == "analyst":
+        with st.chat_message(role, avatar="❄️"):
+            display_message(content, idx)
+    else:
+        with st.chat_message(role):
+            display_message(content, idx)
+
+
+def _handle_text(item: Dict, message_index: int, item_index: int):
+    """Render a text content item as markdown."""
+    st.markdown(item["text"])
+
+
+def _select_suggestion(suggestion: str):
+    """on_click callback of a suggestion button: queue it as the next question."""
+    st.session_state.active_suggestion = suggestion
+
+
+@st.fragment
+def _render_suggestions(suggestions: List[str], message_index: int, item_index: int):
+    """Render suggestion buttons; only a click escalates to a full app rerun."""
+    with st.form(key=f"suggform_{message_index}_{item_index}", border=False):
+        # Submit buttons are identified by their label within the form, so skip repeats
+        for suggestion in dict.fromkeys(suggestions):
+            if st.form_submit_button(suggestion, on_click=_select_suggestion, args=(suggestion,)):
+                # The new turn is added below the whole conversation by the chat input
+                # handler, which runs outside this fragment
+                st.rerun()
+
+
+def _handle_suggestions(item: Dict, message_index: int, item_index: int):
+    """Render suggested questions as buttons."""
+    _render_suggestions(item["suggestions"], message_index, item_index)
+
+
+def _handle_sql(item: Dict, message_index: int, item_index: int):
+    """Display the SQL query and its results."""
+    display_sql_query(item["statement"], message_index)
+
+
+def _handle_error(item: Dict, message_index: int, item_index: int):
+    """Display error messages with a distinctive style."""
+    st.error(item["text"])
+
+
+def _handle_unknown(item: Dict, message_index: int, item_index: int):
+    """Fallback for content types this app doesn't know how to render."""
+    st.info(f"Unsupported content type: {item['type']}")
+    st.json(item)
+
+
+# Renderer for each message content item type
+_HANDLERS = {
+    "text": _handle_text,
+    "suggestions": _handle_suggestions,
+    "sql": _handle_sql,
+    "error": _handle_error,
+}
+
+# Field each content item type needs before it can be rendered
+_REQUIRED_FIELDS = {
+    "text": "text",
+    "suggestions": "suggestions",
+    "sql": "statement",
+}
+
+
+def _validate_and_normalize(content) -> List[Dict]:
+    """
+    Check message content once, when it is added to the history.
+
+    Malformed items are logged and dropped, so display_message can render the
+    stored content on every rerun without checking it again.
+
+    Args:
+        content: The message content as returned by the Analyst API.
+
+    Returns:
+        List[Dict]: The well-formed content items, never empty.
+    """
+    items = []
+    for item in content if isinstance(content, list) else []:
+        if not isinstance(item, dict) or "type" not in item:
+            logger.warning("Invalid message item format: %s", item)
+            continue
+        item_type = item["type"]
+        if item_type == "error" and "text" not in item:
+            item = {**item, "text": "Unknown error occurred"}
+        elif item_type in _REQUIRED_FIELDS and _REQUIRED_FIELDS[item_type] not in item:
+            logger.warning("%s item missing '%s' field", item_type, _REQUIRED_FIELDS[item_type])
+            continue
+        elif item_type == "suggestions" and not isinstance(item["suggestions"], list):
+            logger.warning("Suggestions item missing valid 'suggestions' list")
+            continue
+        items.append(item)
+
+    if not items:
+        items.append({"type": "text", "text": "Received an empty message from the Analyst API."})
+    return items
+
 
 def display_message(content: List[Dict[str, str]], message_index: int):
     """
     Display a single message content with various content types.
 
+    The content is expected to have gone through _validate_and_normalize already.
+
     Args:
         content (List[Dict[str, str]]): The message content.
         message_index (int): The index of the message for unique component keys.
     """
-    if not content:
-        st.warning("Empty message content")
-        return
-        
     for item_index, item in enumerate(content):
-        if not isinstance(item, dict) or "type" not in item:
-            st.warning(f"Invalid message item format: {item}")
-            continue
-            
-        item_type = item.get("type")
-        
-        if item_type == "text":
-            if "text" in item:
-                st.markdown(item["text"])
-            else:
-                st.warning("Text item missing 'text' field")
-                
-        elif item_type == "suggestions":
-            # Display suggestions as buttons
-            if "suggestions" in item and isinstance(item["suggestions"], list):
-                for suggestion_index, suggestion in enumerate(item["suggestions"]):
-                    if st.button(
-                        suggestion, key=f"suggestion_{message_index}_{item_index}_{suggestion_index}"
-                    ):
-                        st.session_state.active_suggestion = suggestion
-            else:
-                st.warning("Suggestions item missing valid 'suggestions' list")
-                
-        elif item_type == "sql":
-            # Display the SQL query and results
-            if "statement" in item:
-                display_sql_query(item["statement"], message_index)
-            else:
-                st.warning("SQL item missing 'statement' field")
-                
-        elif item_type == "error":
-            # Display error messages with a distinctive style
-            if "text" in item:
-                st.error(item["text"])
-            else:
-                st.error("Unknown error occurred")
-                
-        else:
-            # Handle other content types
-            st.info(f"Unsupported content type: {item_type}")
-            st.json(item)
+        _HANDLERS.get(item["type"], _handle_unknown)(item, message_index, item_index)
 
-@st.cache_data(show_spinner=False)
-def get_query_exec_result(query: str) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
+@st.cache_data(show_spinner=False, max_entries=256)
+def _column_fill_values(query: str, session_key: str, _snowpark_df) -> List[Tuple[str, Optional[float]]]:
+    """
+    Work out which columns of a query need NULLs replaced so they convert to pandas.
+
+    Only the query's metadata is used (Snowpark describes the query without running
+    it), and the result is cached per query text and connection.
+
+    Args:
+        query (str): The SQL query, used as the cache key.
+        session_key (str): Identifies the connection the query runs on, see _open_connection.
+        _snowpark_df: The Snowpark DataFrame of the query (not hashed).
+
+    Returns:
+        List[Tuple[str, Optional[float]]]: (column name, fill value) pairs; the fill
+        value is None for non-numeric columns, which are left as is.
+    """
+    from snowflake.snowpark.types import (
+        ByteType, DecimalType, DoubleType, FloatType, IntegerType, LongType, ShortType
+    )
+
+    fill_by_type = {
+        ByteType: 0, ShortType: 0, IntegerType: 0, LongType: 0,
+        FloatType: 0.0, DoubleType: 0.0, DecimalType: 0.0,
+    }
+    return [
+        (field.name, fill_by_type.get(type(field.datatype)))
+        for field in _snowpark_df.schema.fields
+    ]
+
+
+def _compact_dtypes(df: "pd.DataFrame") -> "pd.DataFrame":
+    """
+    Shrink a query result before it is cached and sent to the browser.
+
+    Integer columns are down-cast to the smallest type that holds their values, and
+    text columns with mostly repeated values become categoricals. Float columns are
+    left alone, since float32 would visibly round amounts.
+
+    Args:
+        df (pd.DataFrame): The fetched rows; modified in place.
+
+    Returns:
+        pd.DataFrame: The same DataFrame.
+    """
+    import pandas as pd
+
+    for name in df.columns:
+        column = df[name]
+        if pd.api.types.is_integer_dtype(column):
+            df[name] = pd.to_numeric(column, downcast="integer")
+        elif column.dtype == object and len(column) and pd.api.types.infer_dtype(column) == "string":
+            if column.nunique() < 0.5 * len(column):
+                df[name] = column.astype("category")
+    return df
+
+
+def _get_session():
+    """Return the Snowpark session attached to this user session by Connect, if any."""
+    return st.session_state.get("session")
+
+
+def _normalize_sql(query: str) -> str:
+    """
+    Normalize a SQL query for use as a cache key.
+
+    Only surrounding whitespace and trailing semicolons are removed; case and inner
+    whitespace are kept because they are significant inside string literals.
+    """
+    return query.strip().rstrip(";").rstrip()
+
+
+def get_query_exec_result(query: str) -> Tuple[Optional["pd.DataFrame"], Optional[str]]:
     """
     Execute the SQL query and convert the results to a pandas DataFrame.
 
@@ -698,11 +1068,33 @@ def get_query_exec_result(query: str) -> Tuple[Optional[pd.DataFrame], Optional[
     Returns:
         Tuple[Optional[pd.DataFrame], Optional[str]]: The query results as DataFrame and any error message.
     """
-    # Use session from session state if available, otherwise use global session
-    current_session = st.session_state.get('session') or session
-    
+    current_session = _get_session()
     if current_session is None:
         return None, "No active Snowflake session. Please connect to Snowflake first."
+    return _get_query_exec_result_cached(
+        _normalize_sql(query), st.session_state.get("_session_key", ""), query, current_session
+    )
+
+
+# The spinner only shows when the query actually runs, not for cached results
+@st.cache_data(show_spinner="Running SQL...", ttl=3600, max_entries=128)
+def _get_query_exec_result_cached(
+    norm_query: str, session_key: str, _raw_query: str, _session
+) -> Tuple[Optional["pd.DataFrame"], Optional[str]]:
+    """
+    Cached implementation of get_query_exec_result, keyed on the normalized query and connection.
+
+    Args:
+        norm_query (str): The normalized query, see _normalize_sql.
+        session_key (str): Identifies the connection the query runs on, see _open_connection.
+        _raw_query (str): The query as generated (not hashed).
+        _session: The Snowpark session to run the query with (not hashed).
+
+    Returns:
+        Tuple[Optional[pd.DataFrame], Optional[str]]: The query results as DataFrame and any error message.
+    """
+    query = _raw_query
+    current_session = _session
         
     try:
         # First try to execute with default settings
@@ -710,44 +1102,98 @@ def get_query_exec_result(query: str) -> Tuple[Optional[pd.DataFrame], Optional[
             df = current_session.sql(query).to_pandas()
         except Exception as e:
             if "Cannot convert non-finite values (NA or inf) to integer" in str(e):
-                # Try again with pandas options to handle NA values
-                # Create a temporary table with the results
-                temp_table_name = f"TEMP_QUERY_RESULT_{int(time.time())}"
-                current_session.sql(f"CREATE TEMPORARY TABLE {temp_table_name} AS {query}").collect()
-                
-                # Fetch the schema to determine column types
-                schema_query = f"DESCRIBE TABLE {temp_table_name}"
-                schema_df = current_session.sql(schema_query).to_pandas()
-                
-                # Construct a query that casts problematic columns to appropriate types
-                columns = []
-                for _, row in schema_df.iterrows():
-                    col_name = row['name']
-                    col_type = row['type']
-                    
-                    # For numeric columns that might have NULLs, use COALESCE or explicit casting
-                    if 'INT' in col_type.upper():
-                        columns.append(f"COALESCE({col_name}, 0) AS {col_name}")
-                    elif 'FLOAT' in col_type.upper() or 'DOUBLE' in col_type.upper() or 'DECIMAL' in col_type.upper() or 'NUMERIC' in col_type.upper():
-                        columns.append(f"COALESCE({col_name}, 0.0) AS {col_name}")
-                    else:
-                        columns.append(col_name)
-                
-                # Execute the modified query
-                safe_query = f"SELECT {', '.join(columns)} FROM {temp_table_name}"
-                df = current_session.sql(safe_query).to_pandas()
-                
-                # Clean up the temporary table
-                current_session.sql(f"DROP TABLE IF EXISTS {temp_table_name}").collect()
+                # Try again with NULLs in numeric columns replaced by zeros
+                from snowflake.snowpark.functions import coalesce, col, lit
+
+                snowpark_df = current_session.sql(norm_query)
+                df = snowpark_df.select([
+                    col(name) if fill is None else coalesce(col(name), lit(fill)).alias(name)
+                    for name, fill in _column_fill_values(norm_query, session_key, snowpark_df)
+                ]).to_pandas()
             else:
                 # If it's a different error, re-raise it
                 raise
         
-        return df, None
+        return _compact_dtypes(df), None
     except Exception as e:
         return None, f"Error executing query: {str(e)}"
 
 
+def _df_hash(df: "pd.DataFrame") -> str:
+    """
+    Return a compact content hash of a DataFrame, for use as a cache key.
+
+    hash_pandas_object only covers the values, so the column names and dtypes are
+    hashed as well; otherwise results with equal values under different columns
+    would share a key.
+    """
+    import pandas as pd
+
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr(list(zip(df.columns, map(str, df.dtypes)))).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    return digest.hexdigest()
+
+
+@st.cache_data(show_spinner="Generating insights...", ttl=24 * 3600, max_entries=256)
+def _cortex_insights(df_hash: str, _df: "pd.DataFrame", _session) -> str:
+    """
+    Summarize a query result with Snowflake Cortex.
+
+    The already fetched rows are sent as a bound JSON parameter, so the query is
+    not executed a second time. The summary only depends on those rows, so it is
+    cached per df_hash, and for longer than the query results themselves.
+
+    Args:
+        df_hash (str): Content hash of the result, see _df_hash.
+        _df (pd.DataFrame): The query result to summarize (not hashed).
+        _session: The Snowpark session used to call Cortex (not hashed).
+
+    Returns:
+        str: The generated insights.
+    """
+    prompt = INSIGHTS_PROMPT + _df.to_json(orient="records", date_format="iso")
+    rows = _session.sql(INSIGHTS_SQL, params=[prompt]).collect()
+    return str(rows[0][0])
+
+
+@st.cache_data(show_spinner=False, ttl=600, max_entries=16)
+def _results_csv(df_hash: str, _df: "pd.DataFrame") -> bytes:
+    """
+    Serialize query results to CSV, cached so reruns don't rebuild the download.
+
+    The header row comes from the column names, which is why df_hash must cover
+    them and not only the values.
+
+    Args:
+        df_hash (str): Content hash of the DataFrame's columns, dtypes and values, see _df_hash.
+        _df (pd.DataFrame): The query results (not hashed).
+
+    Returns:
+        bytes: The results as UTF-8 encoded CSV.
+    """
+    return _df.to_csv(index=False).encode()
+
+
+def _run_sql_block(sql: str) -> Optional[Dict]:
+    """
+    Run a SQL block's query.
+
+    Args:
+        sql (str): The SQL query to execute.
+
+    Returns:
+        Optional[Dict]: The results as "df" and "df_hash", plus an "insight" slot that
+        display_sql_query fills in, or None if the query failed (the error is shown).
+    """
+    df, err_msg = get_query_exec_result(sql)
+    if df is None:
+        st.error(f"Could not execute generated SQL query. Error: {err_msg}")
+        return None
+
+    return {"df": df, "df_hash": _df_hash(df), "insight": None}
+
+
 def display_sql_query(sql: str, message_index: int):
     """
     Executes the SQL query and displays the results in form of dataframe and charts.
@@ -762,7 +1208,7 @@ def display_sql_query(sql: str, message_index: int):
         st.code(sql, language="sql")
 
     # Check if we have an active Snowflake session
-    current_session = st.session_state.get('session') or session
+    current_session = _get_session()
     if current_session is None:
         with st.expander("Results", expanded=True):
             st.error("No active Snowflake session. Please connect to Snowflake using the sidebar first.")
@@ -770,56 +1216,80 @@ def display_sql_query(sql: str, message_index: int):
 
     # Display the results of the SQL query
     with st.expander("Results", expanded=True):
-        with st.spinner("Running SQL..."):
-            df, err_msg = get_query_exec_result(sql)
-            if df is None:
-                st.error(f"Could not execute generated SQL query. Error: {err_msg}")
+        norm_sql = _normalize_sql(sql)
+        # What this SQL block rendered last time; reruns redraw it from here without
+        # going back to the (copying) st.cache_data layer
+        render_cache = st.session_state.setdefault("_render_cache", {})
+        block_key = (message_index, norm_sql)
+        rendered = render_cache.pop(block_key, None)
+        if rendered is None:
+            rendered = _run_sql_block(sql)
+            if rendered is None:
                 return
+        # Re-insert so the dict stays ordered from least to most recently drawn, and
+        # drop the oldest blocks; they are fetched from st.cache_data again if needed
+        render_cache[block_key] = rendered
+        while len(render_cache) > MAX_RENDERED_BLOCKS:
+            render_cache.pop(next(iter(render_cache)))
 
-            if df.empty:
-                st.write("Query returned no data")
-                return
-            # Generate insights using Snowflake Cortex if the result set is small enough
-            if len(df) <= 20:
-                sql_new = f'''SELECT SNOWFLAKE.CORTEX.COMPLETE(
-                    'mistral-large2',
-                    'Summarize results, Show trends & Itemize top insights & trends from the following json data in less than 150 words. Data: ' ||
-                    (
-                        SELECT array_agg(object_construct(*))::string as Output from
-                        ({sql.replace(";", "")})
-                    )
-                ) as Insights'''
-                
-                DataSummary = get_query_exec_result(sql_new)
-                st.markdown(str(DataSummary[0].iat[0, 0]))
-            
-            # Show query results in two tabs
-            data_tab, chart_tab = st.tabs(["Data 📄", "Chart 📈 "])
-            with data_tab:
-                st.dataframe(df, use_container_width=True)
+        df = rendered["df"]
+        if df.empty:
+            st.write("Query returned no data")
+            return
+        # Keep the insight's place above the tabs, but fill it in last
+        insight_slot = st.empty()
+
+        # Show query results in two tabs
+        data_tab, chart_tab = st.tabs(["Data 📄", "Chart 📈 "])
+        with data_tab:
+            st.dataframe(df.head(MAX_DISPLAY_ROWS), use_container_width=True, height=400)
+            if len(df) > MAX_DISPLAY_ROWS:
+                st.caption(f"Showing the first {MAX_DISPLAY_ROWS:,} of {len(df):,} rows.")
+                st.download_button(
+                    "Download full results",
+                    data=_results_csv(rendered["df_hash"], df),
+                    file_name="results.csv",
+                    mime="text/csv",
+                    key=f"download_{message_index}",
+                )
 
-            with chart_tab:
-                display_charts_tab(df, message_index)
+        with chart_tab:
+            display_charts_tab(df, message_index)
+
+        # Generate insights using Snowflake Cortex if the result set is small enough (a
+        # single row is already its own summary); the table and chart are on screen by now
+        if rendered["insight"] is None and 1 < len(df) <= 20:
+            try:
+                with insight_slot:
+                    rendered["insight"] = _cortex_insights(rendered["df_hash"], df, current_session)
+            except Exception as e:
+                logger.debug("Failed to generate insights: %s", e)
+                insight_slot.warning(f"Could not generate insights: {e}")
+        if rendered["insight"] is not None:
+            insight_slot.markdown(rendered["insight"])
 
 
-def display_charts_tab(df: pd.DataFrame, message_index: int) -> None:
+@st.fragment
+def display_charts_tab(df: "pd.DataFrame", message_index: int) -> None:
     """
     Display the charts tab.
 
+    Runs as a fragment, so changing the axes or chart type only reruns the chart.
+
     Args:
         df (pd.DataFrame): The query results.
         message_index (int): The index of the message.
     """
     # There should be at least 2 columns to draw charts
     if len(df.columns) >= 2:
-        all_cols_set = set(df.columns)
+        all_cols = df.columns
         col1, col2 = st.columns(2)
         x_col = col1.selectbox(
-            "X axis", all_cols_set, key=f"x_col_select_{message_index}"
+            "X axis", all_cols, key=f"x_col_select_{message_index}"
         )
         y_col = col2.selectbox(
             "Y axis",
-            all_cols_set.difference({x_col}),
+            all_cols.drop(x_col),
             key=f"y_col_select_{message_index}",
         )
         chart_type = st.selectbox(
@@ -827,24 +1297,16 @@ def display_charts_tab(df: pd.DataFrame, message_index: int) -> None:
             options=["Line Chart 📈", "Bar Chart 📊"],
             key=f"chart_type_{message_index}",
         )
+        # Hand the chart just the two plotted columns instead of re-indexing the frame
+        plot_df = df[[x_col, y_col]]
         if chart_type == "Line Chart 📈":
-            st.line_chart(df.set_index(x_col)[y_col])
+            st.line_chart(plot_df, x=x_col, y=y_col)
         elif chart_type == "Bar Chart 📊":
-            st.bar_chart(df.set_index(x_col)[y_col])
+            st.bar_chart(plot_df, x=x_col, y=y_col)
     else:
         st.write("At least 2 columns are required")
 
 
 if __name__ == "__main__":
     main()
-    st.markdown("---")
-    st.markdown("Developed by [John Park, Qlik Analytics PreSales Architect](https://www.linkedin.com/in/jpark328/) | [Email](mailto:john.park@qlik.com) | [GitHub Repo](https://github.com/Parkman328/chatbot-demojrp/)")
-    st.markdown(
-        "<hr style='margin-top:2em; margin-bottom:1em;'>"
-        "<div style='text-align:center; color:gray;'>"
-        "Developed for Demo Purpose Not Production Use."
-        "<br>"
-        "© 2025 Qlik, Inc. All rights reserved."
-        "</div>",
-        unsafe_allow_html=True
-    )
+    st.markdown(_FOOTER_HTML, unsafe_allow_html=True)